@@ -10,6 +10,12 @@ from app.core.config import settings
 # Pool configuration with environment variable overrides
 POOL_SIZE = int(os.getenv("DB_POOL_SIZE", settings.db_pool_size))
 MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", settings.db_max_overflow))
+# Compiled statement cache (SQLAlchemy default is 500 entries)
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", settings.db_query_cache_size))
+# Per-connection server-side prepared statements (asyncpg adapter default is 100)
+PREPARED_STATEMENT_CACHE_SIZE = int(
+    os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", settings.db_prepared_statement_cache_size)
+)
 
 # Create async engine with optimized pooling
 async_engine = create_async_engine(
@@ -21,6 +27,11 @@ async_engine = create_async_engine(
     pool_pre_ping=True,
     pool_recycle=3600,
     pool_timeout=30,
+    query_cache_size=QUERY_CACHE_SIZE,
+    connect_args=(
+        {"prepared_statement_cache_size": PREPARED_STATEMENT_CACHE_SIZE}
+        if "asyncpg" in settings.database_url else {}
+    ),
 )
 
 # Create async session factory
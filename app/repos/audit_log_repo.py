@@ -2,10 +2,10 @@
 Audit log repository for admin action tracking
 """
 
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, or_
 
 from app.models.audit_log import AuditLog
 
@@ -84,6 +84,39 @@ async def get_audit_logs(
     return result.scalars().all()
 
 
+async def get_audit_logs_by_action_keywords(
+    session: AsyncSession,
+    keywords: Sequence[str],
+    limit: int = 50
+) -> List[AuditLog]:
+    """
+    Get audit logs whose action contains any of the given keywords.
+    
+    Matching is case-insensitive and done in the database, so only
+    matching rows are returned.
+    
+    Args:
+        session: Database session
+        keywords: Substrings to look for in the action
+        limit: Maximum number of logs to return
+    
+    Returns:
+        List of AuditLog instances, newest first
+    """
+    if not keywords:
+        return []
+    
+    query = (
+        select(AuditLog)
+        .where(or_(*(AuditLog.action.ilike(f"%{keyword}%") for keyword in keywords)))
+        .order_by(desc(AuditLog.created_at))
+        .limit(limit)
+    )
+    
+    result = await session.execute(query)
+    return result.scalars().all()
+
+
 async def get_audit_log_by_id(session: AsyncSession, log_id: UUID) -> Optional[AuditLog]:
     """
     Get audit log by ID.
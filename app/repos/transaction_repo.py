@@ -6,7 +6,7 @@ from typing import Optional, List
 from uuid import UUID
 from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, literal
 from app.models.transaction import Transaction
 
 
@@ -170,4 +170,30 @@ async def get_transaction_by_metadata(
         query = query.where(Transaction.tx_metadata[key].astext == str(value))
     
     result = await session.execute(query.limit(1))
-    return result.scalar_one_or_none()
\ No newline at end of file
+    return result.scalar_one_or_none()
+
+
+async def tx_confirmed_exists(
+    session: AsyncSession,
+    user_id: UUID,
+    tx_hash: str
+) -> bool:
+    """
+    Check whether a user has a confirmed transaction with the given hash.
+    
+    Args:
+        session: Database session
+        user_id: User UUID
+        tx_hash: Blockchain transaction hash stored in metadata
+    
+    Returns:
+        True if a matching confirmed transaction exists
+    """
+    query = select(literal(1)).where(
+        Transaction.user_id == user_id,
+        Transaction.tx_metadata["tx_hash"].as_string() == tx_hash,
+        Transaction.tx_metadata["status"].as_string() == "confirmed"
+    ).limit(1)
+    
+    result = await session.execute(query)
+    return result.scalars().first() is not None
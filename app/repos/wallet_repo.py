@@ -2,7 +2,7 @@
 Wallet repository with atomic balance operations
 """
 
-from typing import Optional, Tuple
+from typing import Dict, Optional, Sequence, Tuple
 from uuid import UUID
 from decimal import Decimal
 import logging
@@ -33,6 +33,28 @@ async def get_wallet_for_user(session: AsyncSession, user_id: UUID) -> Optional[
     return result.scalar_one_or_none()
 
 
+async def get_wallets_by_usernames(
+    session: AsyncSession,
+    usernames: Sequence[str]
+) -> Dict[str, Wallet]:
+    """
+    Get wallets for several users by username in a single query.
+    
+    Args:
+        session: Database session
+        usernames: Usernames to look up
+    
+    Returns:
+        Dict mapping username to Wallet; users without a wallet are omitted
+    """
+    result = await session.execute(
+        select(User.username, Wallet)
+        .join(Wallet, Wallet.user_id == User.id)
+        .where(User.username.in_(usernames))
+    )
+    return {username: wallet for username, wallet in result.all()}
+
+
 async def create_wallet_for_user(session: AsyncSession, user_id: UUID) -> Wallet:
     """
     Create a new wallet for a user.
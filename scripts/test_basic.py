@@ -3,38 +3,42 @@
 Basic test script to verify smoke test functionality
 """
 
+import importlib
 import sys
 import os
 
+# Add the project root to the Python path once
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (module, attribute) pairs that must be importable; attribute None means the module itself
+REQUIRED_IMPORTS = [
+    ("scripts.smoke_test", None),
+    ("scripts.smoke_test", "SmokeTestRunner"),
+]
+
 def test_imports():
     """Test if all required modules can be imported"""
     print("Testing imports...")
     
-    try:
-        # Add the project root to the Python path
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        import scripts.smoke_test
-        print("✓ scripts.smoke_test imported successfully")
-    except ImportError as e:
-        print(f"✗ Failed to import scripts.smoke_test: {e}")
-        return False
-    
-    try:
-        from scripts.smoke_test import SmokeTestRunner
-        print("✓ SmokeTestRunner imported successfully")
-    except ImportError as e:
-        print(f"✗ Failed to import SmokeTestRunner: {e}")
-        return False
+    ok = True
+    for module_name, attr in REQUIRED_IMPORTS:
+        label = f"{module_name}.{attr}" if attr else module_name
+        try:
+            module = importlib.import_module(module_name)
+            if attr:
+                getattr(module, attr)
+            print(f"✓ {label} imported successfully")
+        except (ImportError, AttributeError) as e:
+            print(f"✗ Failed to import {label}: {e}")
+            ok = False
     
-    return True
+    return ok
 
 def test_runner_creation():
     """Test if SmokeTestRunner can be created"""
     print("Testing runner creation...")
     
     try:
-        # Add the project root to the Python path
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         from scripts.smoke_test import SmokeTestRunner
         runner = SmokeTestRunner()
         print("✓ SmokeTestRunner created successfully")
@@ -53,16 +57,14 @@ def test_help():
     print("Testing help functionality...")
     
     try:
-        import subprocess
-        result = subprocess.run([
-            sys.executable, "scripts/smoke_test.py", "--help"
-        ], capture_output=True, text=True)
+        from scripts.smoke_test import build_parser
+        help_text = build_parser().format_help()
         
-        if result.returncode == 0 and "usage:" in result.stdout:
+        if "usage:" in help_text:
             print("✓ Help functionality works")
             return True
         else:
-            print(f"✗ Help functionality failed: {result.stderr}")
+            print("✗ Help functionality failed: no usage line")
             return False
     except Exception as e:
         print(f"✗ Help test failed: {e}")
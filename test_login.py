@@ -2,14 +2,46 @@
 import asyncio
 import httpx
 
+# Keep-alive client shared by every call in this script
+_CLIENT = httpx.AsyncClient(base_url='http://app:8000', timeout=5.0)
+
+USERNAME = 'smoke_user_a_1758295117'
+PASSWORD = 'smoke-password'
+
 async def test_register():
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            'http://app:8000/api/v1/register',
-            json={'username': 'smoke_user_a_1758295117', 'telegram_id': 1001}
-        )
-        print(f'Status: {response.status_code}')
-        print(f'Response: {response.text}')
+    # The health probe is independent, so it shares the round trip
+    response, health = await asyncio.gather(
+        _CLIENT.post(
+            '/api/v1/register',
+            json={'username': USERNAME, 'telegram_id': 1001, 'password': PASSWORD}
+        ),
+        _CLIENT.get('/api/v1/health')
+    )
+    print(f'Health: {health.status_code}')
+    print(f'Status: {response.status_code}')
+    print(f'Response: {response.text}')
+
+async def test_login():
+    response = await _CLIENT.post(
+        '/api/v1/login',
+        json={'username': USERNAME, 'password': PASSWORD}
+    )
+    print(f'Login status: {response.status_code}')
+    print(f'Login response: {response.text}')
+
+async def main():
+    try:
+        # Login needs the registered user, so it runs after register
+        await test_register()
+        await test_login()
+    finally:
+        await _CLIENT.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(test_register())
+    try:
+        import uvloop
+    except ImportError:  # not installed on Windows
+        pass
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(main())
@@ -4,6 +4,11 @@ Test configuration and fixtures for CricAlgo
 This module provides shared fixtures for database, Redis, and application testing.
 It supports both SQLite (fast) and PostgreSQL (realistic) testing modes.
 
+Tables are created once per session. Each test runs inside an outer transaction
+on a single connection (db_connection) that is rolled back afterwards; both
+async_session and the app's get_db override join it through savepoints, so API
+requests see the data a test created and commits never leak between tests.
+
 Usage:
     # Run with SQLite (fast, in-memory)
     pytest tests/
@@ -21,24 +26,24 @@ import pytest
 from typing import AsyncGenerator, Generator
 from decimal import Decimal
 from uuid import uuid4
+from urllib.parse import urlsplit, urlunsplit
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
 from sqlalchemy.pool import StaticPool
 from sqlalchemy import text
 import redis.asyncio as redis
-from httpx import AsyncClient
+from httpx import ASGITransport, AsyncClient
 from fastapi import FastAPI
 
 from app.core.config import settings
 from app.db.base import Base
 from app.db.session import get_db
+import app.core.redis_client as app_redis
 from app.main import app
 from app.models.user import User
 from app.models.wallet import Wallet
 from app.models.transaction import Transaction
-from app.models.enums import UserStatus
-from app.repos.user_repo import create_user
-from app.repos.wallet_repo import create_wallet_for_user
+from tests.fixtures.database import _DUMMY_TX_HASH, bootstrap_user_with_balance
 
 
 def pytest_addoption(parser):
@@ -59,8 +64,14 @@ def pytest_addoption(parser):
 
 @pytest.fixture(scope="session")
 def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
+    """Create the event loop for the test session (uvloop when available)."""
+    try:
+        import uvloop
+    except ImportError:  # not installed on Windows
+        policy = asyncio.get_event_loop_policy()
+    else:
+        policy = uvloop.EventLoopPolicy()
+    loop = policy.new_event_loop()
     yield loop
     loop.close()
 
@@ -96,6 +107,9 @@ async def db_engine(db_url):
     is_postgres = "postgresql" in db_url
     is_sqlite = "sqlite" in db_url
     
+    # One schema per xdist worker so parallel workers never drop each other's tables
+    schema = f"test_schema_{os.getenv('PYTEST_XDIST_WORKER', 'main')}"
+    
     if is_sqlite:
         # Use in-memory SQLite for fast tests
         engine = create_async_engine(
@@ -105,21 +119,28 @@ async def db_engine(db_url):
             connect_args={"check_same_thread": False}
         )
     else:
-        # Use PostgreSQL with connection pooling
+        # Use PostgreSQL with connection pooling; no pre-ping for a
+        # short-lived local test database, it costs a round trip per checkout.
+        # A test and its API requests share one connection (db_connection),
+        # so a small pool is enough.
         engine = create_async_engine(
             db_url,
             echo=False,
             pool_size=5,
             max_overflow=10,
-            pool_pre_ping=True
+            # Set on every pooled connection, not just the DDL one, so all
+            # of this worker's queries resolve tables in its own schema
+            connect_args={"server_settings": {"search_path": f"{schema},public"}}
         )
     
     # Create all tables
     async with engine.begin() as conn:
         if is_postgres:
-            # For PostgreSQL, create a test schema
-            await conn.execute(text("CREATE SCHEMA IF NOT EXISTS test_schema"))
-            await conn.execute(text("SET search_path TO test_schema, public"))
+            # For PostgreSQL, create the test schema. The DDL transaction sees
+            # only that schema: create_all skips any table it can see, and
+            # tables migrated into public would otherwise count as existing.
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+            await conn.execute(text(f"SET LOCAL search_path TO {schema}"))
         
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
@@ -129,110 +150,140 @@ async def db_engine(db_url):
     # Cleanup
     if is_postgres:
         async with engine.begin() as conn:
-            await conn.execute(text("DROP SCHEMA IF EXISTS test_schema CASCADE"))
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
     
     await engine.dispose()
 
 
 @pytest.fixture
-async def async_session(db_engine) -> AsyncGenerator[AsyncSession, None]:
+async def db_connection(db_engine) -> AsyncGenerator[AsyncConnection, None]:
     """
-    Create an async database session with transaction rollback.
+    Open a connection with an outer transaction for a single test.
     
-    This fixture:
-    1. Creates a new session
-    2. Begins a savepoint (nested transaction)
-    3. Yields the session for test use
-    4. Rolls back to savepoint after test (ensuring test isolation)
+    Every session used by the test, including the ones the app opens for
+    API requests, binds to this connection, so they all see each other's
+    writes. The outer transaction is rolled back after the test.
     """
-    async_session_factory = async_sessionmaker(
-        db_engine, 
-        class_=AsyncSession, 
-        expire_on_commit=False
-    )
-    
-    async with async_session_factory() as session:
-        # Begin a savepoint for rollback
-        await session.begin_nested()
-        
+    async with db_engine.connect() as conn:
+        trans = await conn.begin()
         try:
-            yield session
+            yield conn
         finally:
-            # Rollback to savepoint to ensure test isolation
-            await session.rollback()
+            # Discard everything the test wrote, even if it committed
+            await trans.rollback()
 
 
 @pytest.fixture
-async def redis_client(redis_url):
+async def async_session(db_connection) -> AsyncGenerator[AsyncSession, None]:
     """
-    Create Redis client with test database isolation.
+    Create an async database session with transaction rollback.
     
     This fixture:
-    1. Connects to Redis
-    2. Flushes the test database before each test
-    3. Yields the client for test use
-    4. Flushes the test database after each test
+    1. Binds a session to the test's connection (see db_connection)
+    2. Makes session.commit() only release a savepoint
+    3. Yields the session for test use
+    4. Leaves the rollback of the outer transaction to db_connection
     """
-    # Use a separate Redis database for tests
-    test_redis_url = redis_url.replace("/0", "/1")  # Use DB 1 for tests
+    async with AsyncSession(
+        bind=db_connection,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint"
+    ) as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+async def redis_session_client(redis_url):
+    """
+    Create one Redis client (and connection pool) for the test session.
     
-    redis_client = redis.from_url(test_redis_url, decode_responses=True)
+    Each xdist worker gets its own Redis database, which is flushed when
+    the session ends.
+    """
+    # Use a separate Redis database for tests: DB 1, or 1 + N for xdist
+    # worker gwN, so a worker's per-test flush never wipes another's keys
+    worker = os.getenv("PYTEST_XDIST_WORKER")
+    db_index = 1 + (int(worker[2:]) if worker else 0)
+    test_redis_url = urlunsplit(urlsplit(redis_url)._replace(path=f"/{db_index}"))
+    
+    client = redis.from_url(test_redis_url, decode_responses=True, max_connections=4)
     
-    # Flush test database before test
-    await redis_client.flushdb()
+    yield client
     
-    yield redis_client
+    await client.flushdb(asynchronous=True)
+    await client.close()
+
+
+@pytest.fixture
+async def redis_client(redis_session_client):
+    """
+    Provide the shared Redis client with an empty test database.
+    
+    FLUSHDB ASYNC empties the keyspace immediately and frees memory in a
+    Redis background thread, so the flush does not block on key count.
+    """
+    await redis_session_client.flushdb(asynchronous=True)
     
-    # Flush test database after test
-    await redis_client.flushdb()
-    await redis_client.close()
+    yield redis_session_client
 
 
 @pytest.fixture
-async def test_app(db_engine, redis_client) -> FastAPI:
+async def test_app(db_connection, redis_client, monkeypatch) -> AsyncGenerator[FastAPI, None]:
     """
     Create test FastAPI app with overridden dependencies.
     
     This fixture:
-    1. Creates a test app instance
-    2. Overrides database dependency to use test session
-    3. Overrides Redis dependency to use test client
-    4. Returns the configured app
+    1. Uses the shared app instance
+    2. Overrides the database dependency with sessions on the test's connection
+    3. Points the app's Redis client at this worker's test database
+    4. Yields the configured app and removes the overrides after the test
     """
-    # Create async session factory for dependency injection
-    async_session_factory = async_sessionmaker(
-        db_engine, 
-        class_=AsyncSession, 
-        expire_on_commit=False
-    )
+    # A connection runs one statement at a time, so overlapping requests
+    # (asyncio.gather fan-out) take turns holding a session on it
+    db_lock = asyncio.Lock()
     
     async def get_test_db():
-        """Test database dependency."""
-        async with async_session_factory() as session:
-            yield session
-    
-    async def get_test_redis():
-        """Test Redis dependency."""
-        return redis_client
+        """Test database dependency joined to the test's outer transaction."""
+        async with db_lock:
+            async with AsyncSession(
+                bind=db_connection,
+                expire_on_commit=False,
+                join_transaction_mode="create_savepoint"
+            ) as session:
+                yield session
     
-    # Override dependencies
     app.dependency_overrides[get_db] = get_test_db
-    # Note: Add Redis dependency override when implemented
+    # The app reads Redis through a module-level singleton; swapping it
+    # keeps idempotency keys in this worker's database
+    monkeypatch.setattr(app_redis, "_redis_client", redis_client)
+    
+    yield app
     
-    return app
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(scope="session")
+def asgi_transport() -> ASGITransport:
+    """
+    Create the in-process ASGI transport once per test session.
+    
+    Dependency overrides are set on the shared app object, so a single
+    transport sees each test's overrides.
+    """
+    return ASGITransport(app=app)
 
 
 @pytest.fixture
-async def test_client(test_app) -> AsyncGenerator[AsyncClient, None]:
+async def test_client(test_app, asgi_transport) -> AsyncGenerator[AsyncClient, None]:
     """
     Create HTTP test client for API testing.
     
     This fixture:
-    1. Creates an AsyncClient with the test app
+    1. Creates an AsyncClient over the shared ASGI transport
     2. Yields the client for test use
     3. Properly closes the client after test
     """
-    async with AsyncClient(app=test_app, base_url="http://test") as client:
+    async with AsyncClient(transport=asgi_transport, base_url="http://test") as client:
         yield client
 
 
@@ -243,44 +294,27 @@ async def test_user(async_session: AsyncSession) -> User:
     import time
     unique_telegram_id = int(time.time() * 1000) % 1000000  # Use timestamp for uniqueness
     unique_username = f"testuser_{unique_telegram_id}"  # Make username unique too
-    user = await create_user(
-        session=async_session,
+    
+    # User and wallet in one commit
+    return await bootstrap_user_with_balance(
+        async_session,
         telegram_id=unique_telegram_id,
-        username=unique_username,
-        status=UserStatus.ACTIVE.value
+        username=unique_username
     )
-    
-    # Create wallet for user
-    await create_wallet_for_user(async_session, user.id)
-    
-    return user
 
 
 @pytest.fixture
 async def test_user_with_balance(async_session: AsyncSession) -> User:
     """Create a test user with wallet and initial balance."""
-    from app.repos.wallet_repo import update_balances_atomic
-    
-    user = await create_user(
-        session=async_session,
+    # User and funded wallet in one commit
+    return await bootstrap_user_with_balance(
+        async_session,
         telegram_id=67890,
         username="richuser",
-        status=UserStatus.ACTIVE.value
+        deposit_balance=Decimal('100.00'),
+        bonus_balance=Decimal('50.00'),
+        winning_balance=Decimal('25.00')
     )
-    
-    # Create wallet for user
-    await create_wallet_for_user(async_session, user.id)
-    
-    # Add some balance
-    await update_balances_atomic(
-        async_session,
-        user.id,
-        deposit_delta=Decimal('100.00'),
-        bonus_delta=Decimal('50.00'),
-        winning_delta=Decimal('25.00')
-    )
-    
-    return user
 
 
 @pytest.fixture
@@ -306,7 +340,7 @@ async def test_transaction(async_session: AsyncSession, test_user: User) -> Tran
 @pytest.fixture
 def sample_tx_hash():
     """Generate a sample transaction hash for testing."""
-    return f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+    return _DUMMY_TX_HASH
 
 
 @pytest.fixture
@@ -337,11 +371,5 @@ def pytest_configure(config):
     )
 
 
-# Skip E2E tests by default unless RUN_E2E=1
-def pytest_collection_modifyitems(config, items):
-    """Modify test collection to skip E2E tests by default."""
-    if not os.getenv("RUN_E2E"):
-        skip_e2e = pytest.mark.skip(reason="requires RUN_E2E=1 environment variable")
-        for item in items:
-            if "e2e" in item.keywords:
-                item.add_marker(skip_e2e)
+# Don't collect (or import) E2E modules unless RUN_E2E=1
+collect_ignore_glob = [] if os.getenv("RUN_E2E") else ["e2e/*"]
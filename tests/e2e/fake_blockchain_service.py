@@ -9,10 +9,15 @@ and can be used to test webhook handling and idempotency.
 import asyncio
 import json
 import logging
+import os
+from collections import OrderedDict
+from itertools import islice
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
 
+import orjson
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
 import uvicorn
 
@@ -21,9 +26,38 @@ import uvicorn
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# In-memory storage for webhook data
-webhook_data: Dict[str, Dict[str, Any]] = {}
-processed_webhooks: Dict[str, int] = {}  # Track how many times each webhook was processed
+
+class WebhookRecord:
+    """Latest webhook data for a transaction and how many times it was received"""
+    __slots__ = ("data", "count")
+    
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.count = 0
+
+
+# Constant response bodies, serialized once at import
+_WEBHOOKS_CLEARED = orjson.dumps({"message": "All webhooks cleared successfully"})
+
+# Cap on stored transactions so long benchmark runs keep a constant footprint
+MAX_WEBHOOKS = 10_000
+
+# In-memory storage for webhook data, one record per tx_hash, oldest first
+webhook_store: OrderedDict[str, WebhookRecord] = OrderedDict()
+
+
+def _record_webhook(tx_hash: str, data: Dict[str, Any]) -> None:
+    """Store the latest data for tx_hash, bump its count and evict the oldest"""
+    record = webhook_store.get(tx_hash)
+    if record is None:
+        record = webhook_store[tx_hash] = WebhookRecord()
+    else:
+        webhook_store.move_to_end(tx_hash)
+    record.data = data
+    record.count += 1
+    
+    if len(webhook_store) > MAX_WEBHOOKS:
+        webhook_store.popitem(last=False)
 
 
 class WebhookPayload(BaseModel):
@@ -50,7 +84,8 @@ class WebhookResponse(BaseModel):
 app = FastAPI(
     title="Fake Blockchain Service",
     description="Simulates blockchain webhook service for testing",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 
@@ -60,31 +95,33 @@ async def root():
     return {
         "service": "fake-blockchain",
         "status": "running",
-        "webhooks_received": len(webhook_data),
+        "webhooks_received": len(webhook_store),
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 
 @app.get("/webhooks")
-async def list_webhooks():
-    """List all received webhooks"""
+async def list_webhooks(limit: int = 100):
+    """List the most recently received webhooks"""
+    recent = list(islice(reversed(webhook_store.items()), limit))[::-1]
     return {
-        "webhooks": webhook_data,
-        "processed_counts": processed_webhooks,
-        "total_webhooks": len(webhook_data)
+        "webhooks": {tx_hash: record.data for tx_hash, record in recent},
+        "processed_counts": {tx_hash: record.count for tx_hash, record in recent},
+        "total_webhooks": len(webhook_store)
     }
 
 
 @app.get("/webhooks/{tx_hash}")
 async def get_webhook(tx_hash: str):
     """Get webhook data for a specific transaction"""
-    if tx_hash not in webhook_data:
+    record = webhook_store.get(tx_hash)
+    if record is None:
         raise HTTPException(status_code=404, detail="Webhook not found")
     
     return {
         "tx_hash": tx_hash,
-        "data": webhook_data[tx_hash],
-        "processed_count": processed_webhooks.get(tx_hash, 0)
+        "data": record.data,
+        "processed_count": record.count
     }
 
 
@@ -97,9 +134,10 @@ async def receive_webhook(payload: WebhookPayload):
     and stores it in memory for testing purposes.
     """
     tx_hash = payload.tx_hash
+    now = datetime.now(timezone.utc).isoformat()
     
-    # Store webhook data
-    webhook_data[tx_hash] = {
+    # Store webhook data and track processing count
+    _record_webhook(tx_hash, {
         "tx_hash": tx_hash,
         "confirmations": payload.confirmations,
         "amount": payload.amount,
@@ -108,11 +146,8 @@ async def receive_webhook(payload: WebhookPayload):
         "block_number": payload.block_number,
         "user_id": payload.user_id,
         "metadata": payload.metadata or {},
-        "received_at": datetime.now(timezone.utc).isoformat()
-    }
-    
-    # Track processing count
-    processed_webhooks[tx_hash] = processed_webhooks.get(tx_hash, 0) + 1
+        "received_at": now
+    })
     
     logger.info(f"Received webhook for tx_hash: {tx_hash}, confirmations: {payload.confirmations}")
     
@@ -120,7 +155,7 @@ async def receive_webhook(payload: WebhookPayload):
         success=True,
         message="Webhook received successfully",
         tx_hash=tx_hash,
-        processed_at=datetime.now(timezone.utc).isoformat()
+        processed_at=now
     )
 
 
@@ -135,9 +170,10 @@ async def simulate_confirmation(payload: WebhookPayload):
     # This would normally send HTTP request to main app
     # For testing, we'll just store the data and return success
     tx_hash = payload.tx_hash
+    now = datetime.now(timezone.utc).isoformat()
     
     # Store as confirmed webhook
-    webhook_data[tx_hash] = {
+    _record_webhook(tx_hash, {
         "tx_hash": tx_hash,
         "confirmations": payload.confirmations,
         "amount": payload.amount,
@@ -146,11 +182,9 @@ async def simulate_confirmation(payload: WebhookPayload):
         "block_number": payload.block_number,
         "user_id": payload.user_id,
         "metadata": payload.metadata or {},
-        "received_at": datetime.now(timezone.utc).isoformat(),
+        "received_at": now,
         "simulated": True
-    }
-    
-    processed_webhooks[tx_hash] = processed_webhooks.get(tx_hash, 0) + 1
+    })
     
     logger.info(f"Simulated confirmation for tx_hash: {tx_hash}")
     
@@ -158,53 +192,51 @@ async def simulate_confirmation(payload: WebhookPayload):
         success=True,
         message="Confirmation simulated successfully",
         tx_hash=tx_hash,
-        processed_at=datetime.now(timezone.utc).isoformat()
+        processed_at=now
     )
 
 
 @app.delete("/webhooks/{tx_hash}")
 async def delete_webhook(tx_hash: str):
     """Delete webhook data for a specific transaction"""
-    if tx_hash not in webhook_data:
+    if webhook_store.pop(tx_hash, None) is None:
         raise HTTPException(status_code=404, detail="Webhook not found")
     
-    del webhook_data[tx_hash]
-    if tx_hash in processed_webhooks:
-        del processed_webhooks[tx_hash]
-    
     return {"message": f"Webhook {tx_hash} deleted successfully"}
 
 
 @app.delete("/webhooks")
 async def clear_all_webhooks():
     """Clear all webhook data"""
-    webhook_data.clear()
-    processed_webhooks.clear()
+    webhook_store.clear()
     
-    return {"message": "All webhooks cleared successfully"}
+    return Response(content=_WEBHOOKS_CLEARED, media_type="application/json")
 
 
 @app.get("/stats")
 async def get_stats():
     """Get service statistics"""
+    total_attempts = sum(record.count for record in webhook_store.values())
+    
     return {
-        "total_webhooks": len(webhook_data),
-        "unique_transactions": len(set(webhook_data.keys())),
-        "total_processing_attempts": sum(processed_webhooks.values()),
+        "total_webhooks": len(webhook_store),
+        "unique_transactions": len(webhook_store),
+        "total_processing_attempts": total_attempts,
         "average_processing_per_tx": (
-            sum(processed_webhooks.values()) / len(processed_webhooks)
-            if processed_webhooks else 0
+            total_attempts / len(webhook_store) if webhook_store else 0
         ),
         "service_uptime": "unknown"  # Could implement proper uptime tracking
     }
 
 
 if __name__ == "__main__":
-    # Run the fake blockchain service
+    # Run the fake blockchain service. Webhook state lives in process memory,
+    # so this stays a single worker; uvicorn[standard] picks uvloop/httptools.
+    # Auto-reload spawns a file-watching supervisor, so it is opt-in.
     uvicorn.run(
         "fake_blockchain_service:app",
         host="0.0.0.0",
         port=8081,
-        reload=True,
+        reload=os.getenv("FAKE_BLOCKCHAIN_RELOAD", "0") == "1",
         log_level="info"
     )
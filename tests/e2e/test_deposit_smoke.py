@@ -4,68 +4,95 @@ End-to-end tests for deposit processing smoke test
 
 import pytest
 import asyncio
-import json
 import hmac
 import hashlib
 from decimal import Decimal
 from uuid import UUID, uuid4
 from unittest.mock import patch
 
-from fastapi.testclient import TestClient
+import orjson
+from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.main import app
 from app.models.user import User
 from app.models.wallet import Wallet
 from app.models.transaction import Transaction
 from app.tasks.deposits import process_deposit
 from app.core.config import settings
+from tests.fixtures.database import bootstrap_user_with_balance
 
 
-@pytest.fixture
-def client():
-    """Create test client."""
-    return TestClient(app)
+class FakeRedis:
+    """Minimal async Redis stand-in for the webhook idempotency checks."""
+    
+    def __init__(self, already_enqueued: bool = False):
+        self.already_enqueued = already_enqueued
+    
+    async def exists(self, *keys):
+        return self.already_enqueued
+    
+    async def set(self, *args, **kwargs):
+        return True
+
+
+def patch_redis(fake_redis: FakeRedis):
+    """Patch the webhook module's get_redis to return fake_redis."""
+    async def get_redis():
+        return fake_redis
+    
+    return patch('app.api.v1.webhooks.get_redis', new=get_redis)
+
+
+@pytest.fixture(scope="session")
+def webhook_signer():
+    """Keyed HMAC-SHA256 prototype; copy it per body instead of re-keying."""
+    if not settings.webhook_secret:
+        return None
+    return hmac.new(settings.webhook_secret.encode(), None, hashlib.sha256)
+
+
+def sign_body(signer, body: bytes) -> str:
+    """Sign a webhook body with a copy of the keyed prototype."""
+    h = signer.copy()
+    h.update(body)
+    return h.hexdigest()
+
+
+def encode_payload(payload: dict) -> bytes:
+    """Serialize a webhook payload once; these exact bytes are signed and sent."""
+    return orjson.dumps(payload)
+
+
+async def post_webhook(client: AsyncClient, body: bytes, headers: dict = None):
+    """POST a pre-serialized webhook body to the BEP20 endpoint."""
+    return await client.post(
+        "/api/v1/webhook/bep20",
+        content=body,
+        headers={"content-type": "application/json", **(headers or {})}
+    )
 
 
 @pytest.fixture
-async def test_user(session: AsyncSession):
+async def test_user(async_session: AsyncSession):
     """Create a test user with wallet."""
-    user = User(
-        id=uuid4(),
+    # User and wallet in one commit; both stay live in the session
+    return await bootstrap_user_with_balance(
+        async_session,
         telegram_id=123456789,
-        username="smoketestuser",
-        status="active"
-    )
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
-    
-    # Create wallet for user
-    wallet = Wallet(
-        user_id=user.id,
-        deposit_balance=Decimal('0'),
-        winning_balance=Decimal('0'),
-        bonus_balance=Decimal('0')
+        username="smoketestuser"
     )
-    session.add(wallet)
-    await session.commit()
-    await session.refresh(wallet)
-    
-    return user
 
 
 class TestDepositSmokeE2E:
     """End-to-end smoke tests for deposit processing."""
     
-    def test_deposit_processing_full_pipeline(self, client: TestClient, test_user: User):
+    @pytest.mark.asyncio
+    async def test_deposit_processing_full_pipeline(
+        self, test_client: AsyncClient, test_user: User, webhook_signer
+    ):
         """Test complete deposit processing pipeline from webhook to wallet credit."""
-        # Mock Redis client
-        with patch('app.api.v1.webhooks.get_redis') as mock_get_redis:
-            mock_redis = AsyncMock()
-            mock_redis.exists.return_value = False  # Not already enqueued
-            mock_redis.set.return_value = True  # Successfully mark as enqueued
-            mock_get_redis.return_value = mock_redis
+        # Stub Redis: not already enqueued, marking as enqueued succeeds
+        with patch_redis(FakeRedis()):
             
             # Mock Celery task to run synchronously
             with patch('app.api.v1.webhooks.process_deposit.delay') as mock_delay:
@@ -92,21 +119,12 @@ class TestDepositSmokeE2E:
                 }
                 
                 # Calculate HMAC signature if webhook secret is configured
+                body = encode_payload(webhook_payload)
                 headers = {}
-                if settings.webhook_secret:
-                    body = json.dumps(webhook_payload).encode()
-                    signature = hmac.new(
-                        settings.webhook_secret.encode(),
-                        body,
-                        hashlib.sha256
-                    ).hexdigest()
-                    headers["X-Signature"] = signature
+                if webhook_signer is not None:
+                    headers["X-Signature"] = sign_body(webhook_signer, body)
                 
-                response = client.post(
-                    "/api/v1/webhook/bep20",
-                    json=webhook_payload,
-                    headers=headers
-                )
+                response = await post_webhook(test_client, body, headers)
                 
                 # Verify webhook response
                 assert response.status_code == 200
@@ -125,14 +143,12 @@ class TestDepositSmokeE2E:
                 # For this test, we'll verify the task completed successfully
                 assert tx_id is not None
     
-    def test_duplicate_webhook_idempotency(self, client: TestClient, test_user: User):
+    @pytest.mark.asyncio
+    async def test_duplicate_webhook_idempotency(self, test_client: AsyncClient, test_user: User):
         """Test that duplicate webhooks don't cause double processing."""
-        # Mock Redis client
-        with patch('app.api.v1.webhooks.get_redis') as mock_get_redis:
-            mock_redis = AsyncMock()
-            mock_redis.exists.return_value = False  # First call: not enqueued
-            mock_redis.set.return_value = True  # Successfully mark as enqueued
-            mock_get_redis.return_value = mock_redis
+        # Stub Redis: first call not enqueued, marking as enqueued succeeds
+        fake_redis = FakeRedis()
+        with patch_redis(fake_redis):
             
             # Mock Celery task
             with patch('app.api.v1.webhooks.process_deposit.delay') as mock_delay:
@@ -149,18 +165,21 @@ class TestDepositSmokeE2E:
                     "metadata": {}
                 }
                 
+                # Serialize once; the duplicate resends the same bytes
+                body = encode_payload(webhook_payload)
+                
                 # First webhook call
-                response1 = client.post("/api/v1/webhook/bep20", json=webhook_payload)
+                response1 = await post_webhook(test_client, body)
                 assert response1.status_code == 200
                 data1 = response1.json()
                 assert data1["ok"] is True
                 assert data1["enqueued"] is True
                 
                 # Update Redis mock to simulate already enqueued
-                mock_redis.exists.return_value = True
+                fake_redis.already_enqueued = True
                 
                 # Second webhook call (duplicate)
-                response2 = client.post("/api/v1/webhook/bep20", json=webhook_payload)
+                response2 = await post_webhook(test_client, body)
                 assert response2.status_code == 200
                 data2 = response2.json()
                 assert data2["ok"] is True
@@ -170,12 +189,11 @@ class TestDepositSmokeE2E:
                 # Verify task was only called once
                 assert mock_delay.call_count == 1
     
-    def test_insufficient_confirmations_webhook(self, client: TestClient, test_user: User):
+    @pytest.mark.asyncio
+    async def test_insufficient_confirmations_webhook(self, test_client: AsyncClient, test_user: User):
         """Test webhook with insufficient confirmations."""
-        # Mock Redis client
-        with patch('app.api.v1.webhooks.get_redis') as mock_get_redis:
-            mock_redis = AsyncMock()
-            mock_get_redis.return_value = mock_redis
+        # Stub Redis client
+        with patch_redis(FakeRedis()):
             
             # Mock Celery task
             with patch('app.api.v1.webhooks.process_deposit.delay') as mock_delay:
@@ -192,7 +210,7 @@ class TestDepositSmokeE2E:
                     "metadata": {}
                 }
                 
-                response = client.post("/api/v1/webhook/bep20", json=webhook_payload)
+                response = await post_webhook(test_client, encode_payload(webhook_payload))
                 
                 assert response.status_code == 200
                 data = response.json()
@@ -202,9 +220,12 @@ class TestDepositSmokeE2E:
                 # Verify task was not called
                 mock_delay.assert_not_called()
     
-    def test_webhook_signature_verification(self, client: TestClient, test_user: User):
+    @pytest.mark.asyncio
+    async def test_webhook_signature_verification(
+        self, test_client: AsyncClient, test_user: User, webhook_signer
+    ):
         """Test webhook signature verification."""
-        if not settings.webhook_secret:
+        if webhook_signer is None:
             pytest.skip("Webhook secret not configured")
         
         webhook_payload = {
@@ -218,36 +239,24 @@ class TestDepositSmokeE2E:
             "metadata": {}
         }
         
+        body = encode_payload(webhook_payload)
+        
         # Test with invalid signature
-        response = client.post(
-            "/api/v1/webhook/bep20",
-            json=webhook_payload,
-            headers={"X-Signature": "invalid_signature"}
-        )
+        response = await post_webhook(test_client, body, {"X-Signature": "invalid_signature"})
         assert response.status_code == 401
         assert "Invalid webhook signature" in response.json()["detail"]
         
-        # Test with valid signature
-        body = json.dumps(webhook_payload).encode()
-        signature = hmac.new(
-            settings.webhook_secret.encode(),
-            body,
-            hashlib.sha256
-        ).hexdigest()
+        # Test with valid signature over the same bytes
+        signature = sign_body(webhook_signer, body)
         
-        response = client.post(
-            "/api/v1/webhook/bep20",
-            json=webhook_payload,
-            headers={"X-Signature": signature}
-        )
+        response = await post_webhook(test_client, body, {"X-Signature": signature})
         assert response.status_code == 200
     
-    def test_webhook_without_user_id(self, client: TestClient):
+    @pytest.mark.asyncio
+    async def test_webhook_without_user_id(self, test_client: AsyncClient):
         """Test webhook without user_id (should not create transaction)."""
-        # Mock Redis client
-        with patch('app.api.v1.webhooks.get_redis') as mock_get_redis:
-            mock_redis = AsyncMock()
-            mock_get_redis.return_value = mock_redis
+        # Stub Redis client
+        with patch_redis(FakeRedis()):
             
             # Mock Celery task
             with patch('app.api.v1.webhooks.process_deposit.delay') as mock_delay:
@@ -264,7 +273,7 @@ class TestDepositSmokeE2E:
                     # No user_id
                 }
                 
-                response = client.post("/api/v1/webhook/bep20", json=webhook_payload)
+                response = await post_webhook(test_client, encode_payload(webhook_payload))
                 
                 assert response.status_code == 200
                 data = response.json()
@@ -276,7 +285,7 @@ class TestDepositSmokeE2E:
     
     @pytest.mark.asyncio
     async def test_process_deposit_task_complete_flow(
-        self, session: AsyncSession, test_user: User
+        self, async_session: AsyncSession, test_user: User
     ):
         """Test the complete process_deposit task flow."""
         # Create a transaction
@@ -293,12 +302,12 @@ class TestDepositSmokeE2E:
                 "block_number": 54321
             }
         )
-        session.add(transaction)
-        await session.commit()
-        await session.refresh(transaction)
+        async_session.add(transaction)
+        await async_session.commit()
+        await async_session.refresh(transaction)
         
         # Get initial wallet balance
-        wallet = await session.get(Wallet, test_user.id)
+        wallet = await async_session.get(Wallet, test_user.id)
         initial_balance = wallet.deposit_balance
         
         # Run the process_deposit task
@@ -308,8 +317,8 @@ class TestDepositSmokeE2E:
         assert result is True
         
         # Refresh transaction and wallet from database
-        await session.refresh(transaction)
-        await session.refresh(wallet)
+        await async_session.refresh(transaction)
+        await async_session.refresh(wallet)
         
         # Verify transaction was processed
         assert transaction.processed_at is not None
@@ -325,5 +334,5 @@ class TestDepositSmokeE2E:
         assert result2 is True
         
         # Verify balance didn't change
-        await session.refresh(wallet)
+        await async_session.refresh(wallet)
         assert wallet.deposit_balance == expected_balance
@@ -8,187 +8,167 @@ idempotency testing.
 
 import pytest
 import asyncio
-import subprocess
-import time
-import requests
 from decimal import Decimal
-from uuid import uuid4
-from typing import Optional
 
-from app.repos.user_repo import create_user
-from app.repos.wallet_repo import create_wallet_for_user, get_wallet_for_user
+from app.models.transaction import Transaction
 from app.repos.transaction_repo import create_transaction, get_transaction_by_id
-from app.models.enums import UserStatus
-from tests.fixtures.database import assert_wallet_balance
+from tests.fixtures.database import (
+    _DUMMY_TX_HASH,
+    assert_wallet_balance,
+    bootstrap_user_with_balance,
+    bulk_create_users_with_wallets,
+    deposit_balance_is,
+    setup_user_with_pending_tx,
+    wait_until,
+)
 from tests.fixtures.webhooks import WebhookTestHelper, create_deposit_webhook_payload
 
 
-class FakeBlockchainService:
-    """Helper class to manage fake blockchain service for testing."""
-    
-    def __init__(self, base_url: str = "http://localhost:8081"):
-        self.base_url = base_url
-        self.process: Optional[subprocess.Popen] = None
-    
-    async def start(self):
-        """Start the fake blockchain service."""
-        if self.process is None:
-            self.process = subprocess.Popen([
-                "python", "tests/e2e/fake_blockchain_service.py"
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            
-            # Wait for service to start
-            await self._wait_for_service()
-    
-    async def stop(self):
-        """Stop the fake blockchain service."""
-        if self.process:
-            self.process.terminate()
-            self.process.wait()
-            self.process = None
-    
-    async def _wait_for_service(self, timeout: int = 10):
-        """Wait for the service to be ready."""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                response = requests.get(f"{self.base_url}/", timeout=1)
-                if response.status_code == 200:
-                    return
-            except requests.exceptions.RequestException:
-                pass
-            await asyncio.sleep(0.1)
-        
-        raise TimeoutError("Fake blockchain service failed to start")
-    
-    async def send_webhook(self, payload: dict) -> dict:
-        """Send webhook to the fake blockchain service."""
-        response = requests.post(
-            f"{self.base_url}/webhook",
-            json=payload,
-            timeout=5
+@pytest.fixture
+def webhook_helper(test_client) -> WebhookTestHelper:
+    """Webhook helper bound to the test client."""
+    return WebhookTestHelper(test_client)
+
+
+async def send_flow_webhook(
+    webhook_helper: WebhookTestHelper,
+    kind: str,
+    tx_hash: str,
+    amount: Decimal,
+    user_id: str
+) -> dict:
+    """Send the webhook a transaction flow scenario calls for."""
+    if kind == "failed":
+        return await webhook_helper.send_failed_webhook(
+            tx_hash=tx_hash,
+            reason="Insufficient gas"
+        )
+    if kind == "pending":
+        return await webhook_helper.send_pending_webhook(
+            tx_hash=tx_hash,
+            confirmations=1,  # Less than required threshold
+            amount=str(amount),
+            currency="USDT"
         )
-        return response.json()
-    
-    async def get_webhook_data(self, tx_hash: str) -> dict:
-        """Get webhook data from the fake blockchain service."""
-        response = requests.get(f"{self.base_url}/webhooks/{tx_hash}", timeout=5)
-        return response.json()
     
-    async def clear_webhooks(self):
-        """Clear all webhook data."""
-        requests.delete(f"{self.base_url}/webhooks", timeout=5)
+    send = (
+        webhook_helper.send_deposit_webhook if kind == "deposit"
+        else webhook_helper.send_withdrawal_webhook
+    )
+    return await send(
+        tx_hash=tx_hash,
+        confirmations=12,
+        amount=str(amount),
+        currency="USDT",
+        user_id=user_id
+    )
+
+
+# (tx_type, amount, initial_deposit, webhook_kind, expected_deposit)
+TRANSACTION_FLOW_SCENARIOS = [
+    pytest.param(
+        "deposit", Decimal('100.00'), Decimal('0.00'), "deposit", Decimal('100.00'),
+        id="deposit-confirmed"
+    ),
+    pytest.param(
+        "withdrawal", Decimal('50.00'), Decimal('200.00'), "withdrawal", Decimal('150.00'),
+        id="withdrawal-confirmed"
+    ),
+    pytest.param(
+        "deposit", Decimal('100.00'), Decimal('0.00'), "failed", Decimal('0.00'),
+        id="deposit-failed"
+    ),
+    pytest.param(
+        "deposit", Decimal('100.00'), Decimal('0.00'), "pending", Decimal('0.00'),
+        id="deposit-insufficient-confirmations"
+    ),
+]
 
 
 @pytest.mark.e2e
 @pytest.mark.asyncio
-async def test_deposit_confirmation_flow(test_client, async_session, redis_client):
+@pytest.mark.parametrize(
+    "tx_type, amount, initial_deposit, webhook_kind, expected_deposit",
+    TRANSACTION_FLOW_SCENARIOS
+)
+async def test_transaction_webhook_flow(
+    async_session,
+    redis_client,
+    webhook_helper,
+    tx_type,
+    amount,
+    initial_deposit,
+    webhook_kind,
+    expected_deposit
+):
     """
-    Test complete deposit confirmation flow:
-    1. Create user and wallet
-    2. Create pending deposit transaction
-    3. Send webhook confirmation
-    4. Verify wallet balance updated
+    Test a single-transaction webhook flow:
+    1. Create user, wallet and pending transaction
+    2. Send the scenario's webhook (confirmed, failed or low confirmations)
+    3. Verify the resulting wallet balance
     """
-    # Create user and wallet
-    user = await create_user(
-        session=async_session,
+    tx_hash = _DUMMY_TX_HASH
+    user, transaction = await setup_user_with_pending_tx(
+        async_session,
         telegram_id=12345,
         username="e2euser",
-        status=UserStatus.ACTIVE
-    )
-    
-    wallet = await create_wallet_for_user(async_session, user.id)
-    
-    # Create pending deposit transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
-    transaction = await create_transaction(
-        session=async_session,
-        user_id=user.id,
-        tx_type="deposit",
-        amount=Decimal('100.00'),
-        currency="USDT",
-        tx_metadata={
-            "tx_hash": tx_hash,
-            "confirmations": 0,
-            "status": "pending"
-        }
+        amount=amount,
+        tx_type=tx_type,
+        tx_hash=tx_hash,
+        deposit_balance=initial_deposit
     )
     
     # Verify initial wallet balance
     await assert_wallet_balance(
         async_session,
         user.id,
-        expected_deposit=Decimal('0.00')
+        expected_deposit=initial_deposit
     )
     
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
-    
-    # Send deposit confirmation webhook
-    webhook_response = await webhook_helper.send_deposit_webhook(
-        tx_hash=tx_hash,
-        confirmations=12,
-        amount="100.00",
-        currency="USDT",
-        user_id=str(user.id)
+    webhook_response = await send_flow_webhook(
+        webhook_helper, webhook_kind, tx_hash, amount, str(user.id)
     )
     
-    # Verify webhook was processed successfully
+    # Verify webhook was received
     assert webhook_response["status_code"] in [200, 201]
     
-    # Wait for background processing (if any)
-    await asyncio.sleep(0.5)
-    
-    # Verify wallet balance was updated
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=Decimal('100.00')
-    )
+    if expected_deposit != initial_deposit:
+        # Return as soon as the balance moves instead of sleeping
+        await wait_until(
+            lambda: deposit_balance_is(async_session, user.id, expected_deposit)
+        )
+    else:
+        # The handler processes webhooks inline within the request, and
+        # failed or low-confirmation ones never touch the balance
+        await assert_wallet_balance(
+            async_session,
+            user.id,
+            expected_deposit=expected_deposit
+        )
     
-    # Verify transaction status was updated
+    # Verify transaction still exists
     updated_transaction = await get_transaction_by_id(async_session, transaction.id)
     assert updated_transaction is not None
-    # Note: This would depend on actual webhook processing implementation
+    # Note: status checks depend on actual webhook processing implementation
 
 
 @pytest.mark.e2e
 @pytest.mark.asyncio
-async def test_webhook_idempotency(test_client, async_session, redis_client):
+async def test_webhook_idempotency(async_session, redis_client, webhook_helper):
     """
     Test webhook idempotency:
     1. Send same webhook multiple times
     2. Verify only one credit occurs
     """
-    # Create user and wallet
-    user = await create_user(
-        session=async_session,
+    tx_hash = _DUMMY_TX_HASH
+    user, transaction = await setup_user_with_pending_tx(
+        async_session,
         telegram_id=67890,
         username="idempotencyuser",
-        status=UserStatus.ACTIVE
-    )
-    
-    wallet = await create_wallet_for_user(async_session, user.id)
-    
-    # Create pending deposit transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
-    transaction = await create_transaction(
-        session=async_session,
-        user_id=user.id,
-        tx_type="deposit",
         amount=Decimal('50.00'),
-        currency="USDT",
-        tx_metadata={
-            "tx_hash": tx_hash,
-            "confirmations": 0,
-            "status": "pending"
-        }
+        tx_hash=tx_hash
     )
     
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
-    
     # Send webhook first time
     response1 = await webhook_helper.send_deposit_webhook(
         tx_hash=tx_hash,
@@ -198,12 +178,10 @@ async def test_webhook_idempotency(test_client, async_session, redis_client):
         user_id=str(user.id)
     )
     
-    # Wait for processing
-    await asyncio.sleep(0.5)
-    
-    # Get balance after first webhook
-    wallet_after_first = await get_wallet_for_user(async_session, user.id)
-    balance_after_first = wallet_after_first.deposit_balance
+    # Wait until the first delivery is credited
+    await wait_until(
+        lambda: deposit_balance_is(async_session, user.id, Decimal('50.00'))
+    )
     
     # Send same webhook again
     response2 = await webhook_helper.send_deposit_webhook(
@@ -214,16 +192,9 @@ async def test_webhook_idempotency(test_client, async_session, redis_client):
         user_id=str(user.id)
     )
     
-    # Wait for processing
-    await asyncio.sleep(0.5)
-    
-    # Get balance after second webhook
-    wallet_after_second = await get_wallet_for_user(async_session, user.id)
-    balance_after_second = wallet_after_second.deposit_balance
-    
-    # Verify balance didn't change (idempotency)
-    assert balance_after_first == balance_after_second
-    assert balance_after_first == Decimal('50.00')
+    # Verify balance didn't change (idempotency). The handler credits
+    # inline within the request, so a double credit would already be visible
+    assert await deposit_balance_is(async_session, user.id, Decimal('50.00'))
     
     # Verify both webhooks were received (but only one processed)
     assert response1["status_code"] in [200, 201]
@@ -232,7 +203,7 @@ async def test_webhook_idempotency(test_client, async_session, redis_client):
 
 @pytest.mark.e2e
 @pytest.mark.asyncio
-async def test_multiple_deposits_same_user(test_client, async_session, redis_client):
+async def test_multiple_deposits_same_user(async_session, redis_client, webhook_helper):
     """
     Test multiple deposits for the same user:
     1. Create user and wallet
@@ -240,21 +211,18 @@ async def test_multiple_deposits_same_user(test_client, async_session, redis_cli
     3. Verify cumulative balance
     """
     # Create user and wallet
-    user = await create_user(
-        session=async_session,
+    user = await bootstrap_user_with_balance(
+        async_session,
         telegram_id=11111,
-        username="multiuser",
-        status=UserStatus.ACTIVE
+        username="multiuser"
     )
     
-    wallet = await create_wallet_for_user(async_session, user.id)
-    
     # Create multiple deposit transactions
     transactions = []
     amounts = [Decimal('25.00'), Decimal('50.00'), Decimal('75.00')]
     
     for i, amount in enumerate(amounts):
-        tx_hash = f"0x{''.join([f'{i:02x}' for j in range(32)])}"
+        tx_hash = f"0x{i:064x}"
         transaction = await create_transaction(
             session=async_session,
             user_id=user.id,
@@ -269,9 +237,6 @@ async def test_multiple_deposits_same_user(test_client, async_session, redis_cli
         )
         transactions.append((transaction, tx_hash, amount))
     
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
-    
     # Process each deposit
     for transaction, tx_hash, amount in transactions:
         response = await webhook_helper.send_deposit_webhook(
@@ -283,250 +248,34 @@ async def test_multiple_deposits_same_user(test_client, async_session, redis_cli
         )
         
         assert response["status_code"] in [200, 201]
-        await asyncio.sleep(0.1)  # Small delay between webhooks
-    
-    # Wait for all processing to complete
-    await asyncio.sleep(1.0)
     
-    # Verify cumulative balance
+    # Wait until the cumulative balance is credited
     expected_total = sum(amounts)
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=expected_total
+    await wait_until(
+        lambda: deposit_balance_is(async_session, user.id, expected_total)
     )
 
 
 @pytest.mark.e2e
 @pytest.mark.asyncio
-async def test_withdrawal_confirmation_flow(test_client, async_session, redis_client):
-    """
-    Test withdrawal confirmation flow:
-    1. Create user with balance
-    2. Create withdrawal transaction
-    3. Send withdrawal confirmation webhook
-    4. Verify balance updated correctly
-    """
-    # Create user with initial balance
-    user = await create_user(
-        session=async_session,
-        telegram_id=22222,
-        username="withdrawaluser",
-        status=UserStatus.ACTIVE
-    )
-    
-    wallet = await create_wallet_for_user(async_session, user.id)
-    
-    # Add initial balance
-    from app.repos.wallet_repo import update_balances_atomic
-    await update_balances_atomic(
-        async_session,
-        user.id,
-        deposit_delta=Decimal('200.00')
-    )
-    
-    # Create withdrawal transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
-    transaction = await create_transaction(
-        session=async_session,
-        user_id=user.id,
-        tx_type="withdrawal",
-        amount=Decimal('50.00'),
-        currency="USDT",
-        tx_metadata={
-            "tx_hash": tx_hash,
-            "confirmations": 0,
-            "status": "pending"
-        }
-    )
-    
-    # Verify initial balance
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=Decimal('200.00')
-    )
-    
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
-    
-    # Send withdrawal confirmation webhook
-    webhook_response = await webhook_helper.send_withdrawal_webhook(
-        tx_hash=tx_hash,
-        confirmations=12,
-        amount="50.00",
-        currency="USDT",
-        user_id=str(user.id)
-    )
-    
-    # Verify webhook was processed
-    assert webhook_response["status_code"] in [200, 201]
-    
-    # Wait for processing
-    await asyncio.sleep(0.5)
-    
-    # Verify balance was updated (withdrawal should reduce balance)
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=Decimal('150.00')  # 200 - 50
-    )
-
-
-@pytest.mark.e2e
-@pytest.mark.asyncio
-async def test_failed_transaction_handling(test_client, async_session, redis_client):
-    """
-    Test handling of failed transactions:
-    1. Create user and transaction
-    2. Send failed transaction webhook
-    3. Verify no balance change
-    """
-    # Create user and wallet
-    user = await create_user(
-        session=async_session,
-        telegram_id=33333,
-        username="faileduser",
-        status=UserStatus.ACTIVE
-    )
-    
-    wallet = await create_wallet_for_user(async_session, user.id)
-    
-    # Create pending transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
-    transaction = await create_transaction(
-        session=async_session,
-        user_id=user.id,
-        tx_type="deposit",
-        amount=Decimal('100.00'),
-        currency="USDT",
-        tx_metadata={
-            "tx_hash": tx_hash,
-            "confirmations": 0,
-            "status": "pending"
-        }
-    )
-    
-    # Verify initial balance
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=Decimal('0.00')
-    )
-    
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
-    
-    # Send failed transaction webhook
-    webhook_response = await webhook_helper.send_failed_webhook(
-        tx_hash=tx_hash,
-        reason="Insufficient gas"
-    )
-    
-    # Verify webhook was received
-    assert webhook_response["status_code"] in [200, 201]
-    
-    # Wait for processing
-    await asyncio.sleep(0.5)
-    
-    # Verify balance was not changed
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=Decimal('0.00')
-    )
-
-
-@pytest.mark.e2e
-@pytest.mark.asyncio
-async def test_insufficient_confirmations_handling(test_client, async_session, redis_client):
-    """
-    Test handling of transactions with insufficient confirmations:
-    1. Create user and transaction
-    2. Send webhook with low confirmations
-    3. Verify transaction remains pending
-    """
-    # Create user and wallet
-    user = await create_user(
-        session=async_session,
-        telegram_id=44444,
-        username="pendinguser",
-        status=UserStatus.ACTIVE
-    )
-    
-    wallet = await create_wallet_for_user(async_session, user.id)
-    
-    # Create pending transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
-    transaction = await create_transaction(
-        session=async_session,
-        user_id=user.id,
-        tx_type="deposit",
-        amount=Decimal('100.00'),
-        currency="USDT",
-        tx_metadata={
-            "tx_hash": tx_hash,
-            "confirmations": 0,
-            "status": "pending"
-        }
-    )
-    
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
-    
-    # Send webhook with insufficient confirmations
-    webhook_response = await webhook_helper.send_pending_webhook(
-        tx_hash=tx_hash,
-        confirmations=1,  # Less than required threshold
-        amount="100.00",
-        currency="USDT"
-    )
-    
-    # Verify webhook was received
-    assert webhook_response["status_code"] in [200, 201]
-    
-    # Wait for processing
-    await asyncio.sleep(0.5)
-    
-    # Verify balance was not changed (insufficient confirmations)
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=Decimal('0.00')
-    )
-    
-    # Verify transaction is still pending
-    updated_transaction = await get_transaction_by_id(async_session, transaction.id)
-    assert updated_transaction is not None
-    # Note: This would depend on actual webhook processing implementation
-
-
-@pytest.mark.e2e
-@pytest.mark.asyncio
-async def test_concurrent_webhook_processing(test_client, async_session, redis_client):
+async def test_concurrent_webhook_processing(async_session, redis_client, webhook_helper):
     """
     Test concurrent webhook processing:
     1. Create multiple users and transactions
     2. Send webhooks concurrently
     3. Verify all balances updated correctly
     """
-    # Create multiple users with wallets
-    users = []
-    transactions = []
-    
-    for i in range(5):
-        user = await create_user(
-            session=async_session,
-            telegram_id=50000 + i,
-            username=f"concurrentuser{i}",
-            status=UserStatus.ACTIVE
-        )
-        
-        wallet = await create_wallet_for_user(async_session, user.id)
-        
-        tx_hash = f"0x{''.join([f'{i:02x}' for j in range(32)])}"
-        transaction = await create_transaction(
-            session=async_session,
+    # Set up every user, wallet and pending deposit in batched inserts. The
+    # test session can't be shared by concurrent tasks, and sessions on
+    # other connections couldn't see the test's transaction, so setup is
+    # batched rather than gathered.
+    users = await bulk_create_users_with_wallets(
+        async_session,
+        [(50000 + i, f"concurrentuser{i}") for i in range(5)]
+    )
+    tx_hashes = [f"0x{i:064x}" for i in range(len(users))]
+    pending = [
+        Transaction(
             user_id=user.id,
             tx_type="deposit",
             amount=Decimal('100.00'),
@@ -537,12 +286,11 @@ async def test_concurrent_webhook_processing(test_client, async_session, redis_c
                 "status": "pending"
             }
         )
-        
-        users.append(user)
-        transactions.append((transaction, tx_hash))
-    
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
+        for user, tx_hash in zip(users, tx_hashes, strict=True)
+    ]
+    async_session.add_all(pending)
+    await async_session.commit()
+    transactions = list(zip(pending, tx_hashes, strict=True))
     
     # Send all webhooks concurrently
     async def send_webhook(transaction, tx_hash):
@@ -566,55 +314,32 @@ async def test_concurrent_webhook_processing(test_client, async_session, redis_c
     for response in responses:
         assert response["status_code"] in [200, 201]
     
-    # Wait for all processing to complete
-    await asyncio.sleep(1.0)
-    
-    # Verify all balances were updated
+    # Wait until every balance is credited; the session is not safe for
+    # concurrent use, so users are polled one after another
     for user in users:
-        await assert_wallet_balance(
-            async_session,
-            user.id,
-            expected_deposit=Decimal('100.00')
+        await wait_until(
+            lambda u=user: deposit_balance_is(async_session, u.id, Decimal('100.00'))
         )
 
 
 @pytest.mark.e2e
 @pytest.mark.asyncio
-async def test_webhook_retry_mechanism(test_client, async_session, redis_client):
+async def test_webhook_retry_mechanism(async_session, redis_client, webhook_helper):
     """
     Test webhook retry mechanism:
     1. Create user and transaction
     2. Send webhook with retries
     3. Verify idempotency is maintained
     """
-    # Create user and wallet
-    user = await create_user(
-        session=async_session,
+    tx_hash = _DUMMY_TX_HASH
+    user, transaction = await setup_user_with_pending_tx(
+        async_session,
         telegram_id=55555,
         username="retryuser",
-        status=UserStatus.ACTIVE
-    )
-    
-    wallet = await create_wallet_for_user(async_session, user.id)
-    
-    # Create pending transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
-    transaction = await create_transaction(
-        session=async_session,
-        user_id=user.id,
-        tx_type="deposit",
         amount=Decimal('75.00'),
-        currency="USDT",
-        tx_metadata={
-            "tx_hash": tx_hash,
-            "confirmations": 0,
-            "status": "pending"
-        }
+        tx_hash=tx_hash
     )
     
-    # Create webhook helper
-    webhook_helper = WebhookTestHelper(test_client)
-    
     # Create webhook payload
     payload = create_deposit_webhook_payload(
         tx_hash=tx_hash,
@@ -638,12 +363,7 @@ async def test_webhook_retry_mechanism(test_client, async_session, redis_client)
     ]
     assert len(successful_responses) >= 1
     
-    # Wait for processing
-    await asyncio.sleep(0.5)
-    
-    # Verify balance was updated only once (idempotency)
-    await assert_wallet_balance(
-        async_session,
-        user.id,
-        expected_deposit=Decimal('75.00')
+    # Wait until the balance is credited (once, by idempotency)
+    await wait_until(
+        lambda: deposit_balance_is(async_session, user.id, Decimal('75.00'))
     )
@@ -3,12 +3,12 @@ Database-specific test fixtures and utilities
 """
 
 import asyncio
-from typing import AsyncGenerator, List
+from typing import AsyncGenerator, Awaitable, Callable, List, Optional, Tuple
 from decimal import Decimal
 from uuid import UUID, uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 
 from app.models.user import User
 from app.models.wallet import Wallet
@@ -19,6 +19,17 @@ from app.repos.wallet_repo import create_wallet_for_user, update_balances_atomic
 from app.repos.transaction_repo import create_transaction
 
 
+# Deterministic placeholder hash (0x000102...1f), built once at import
+_DUMMY_TX_HASH = "0x" + bytes(range(32)).hex()
+
+# Balance columns only: no ORM entity, identity map or attribute loading
+_WALLET_BAL_STMT = select(
+    Wallet.deposit_balance,
+    Wallet.bonus_balance,
+    Wallet.winning_balance
+).where(Wallet.user_id == bindparam("uid"))
+
+
 async def create_test_user_with_wallet(
     session: AsyncSession,
     telegram_id: int,
@@ -63,6 +74,126 @@ async def create_test_user_with_balance(
     return user
 
 
+async def bootstrap_user_with_balance(
+    session: AsyncSession,
+    telegram_id: int,
+    username: str,
+    deposit_balance: Decimal = Decimal('0'),
+    bonus_balance: Decimal = Decimal('0'),
+    winning_balance: Decimal = Decimal('0'),
+    status: str = UserStatus.ACTIVE.value
+) -> User:
+    """
+    Create a user and its funded wallet in a single flush and commit.
+    
+    Unlike create_test_user_with_balance, this skips the repo helpers that
+    commit and refresh after every step; only the returned user is refreshed.
+    """
+    user = User(id=uuid4(), telegram_id=telegram_id, username=username, status=status)
+    wallet = Wallet(
+        user_id=user.id,
+        deposit_balance=deposit_balance,
+        winning_balance=winning_balance,
+        bonus_balance=bonus_balance
+    )
+    session.add_all([user, wallet])
+    await session.commit()
+    # Load server defaults (created_at) so callers never trigger a lazy load
+    await session.refresh(user)
+    
+    return user
+
+
+async def bulk_create_users_with_wallets(
+    session: AsyncSession,
+    specs: List[Tuple[int, str]],
+    status: str = UserStatus.ACTIVE.value
+) -> List[User]:
+    """
+    Create several users and their empty wallets in batched round trips.
+    
+    Builds the rows directly instead of going through the repo helpers,
+    which commit once per call: users and wallets are each inserted by a
+    single flush, followed by one commit.
+    
+    Args:
+        session: Database session
+        specs: (telegram_id, username) pair for each user
+        status: Status given to every user
+    
+    Returns:
+        List of created users, in the order of specs
+    """
+    users = [
+        User(id=uuid4(), telegram_id=telegram_id, username=username, status=status)
+        for telegram_id, username in specs
+    ]
+    session.add_all(users)
+    await session.flush()
+    
+    session.add_all([
+        Wallet(
+            user_id=user.id,
+            deposit_balance=Decimal('0'),
+            winning_balance=Decimal('0'),
+            bonus_balance=Decimal('0')
+        )
+        for user in users
+    ])
+    await session.commit()
+    
+    # One SELECT loads server defaults (created_at) for every user
+    await session.execute(select(User).where(User.id.in_([user.id for user in users])))
+    
+    return users
+
+
+async def setup_user_with_pending_tx(
+    session: AsyncSession,
+    telegram_id: int,
+    username: str,
+    amount: Decimal,
+    tx_type: str = "deposit",
+    tx_hash: Optional[str] = None,
+    deposit_balance: Decimal = Decimal('0')
+) -> Tuple[User, Transaction]:
+    """
+    Create a user, its wallet and one pending transaction awaiting a webhook.
+    
+    Args:
+        session: Database session
+        telegram_id: Telegram ID for the user
+        username: Username for the user
+        amount: Transaction amount
+        tx_type: Transaction type ('deposit' or 'withdrawal')
+        tx_hash: On-chain hash stored in the transaction metadata
+        deposit_balance: Starting deposit balance of the wallet
+    
+    Returns:
+        Tuple of (user, transaction)
+    """
+    if tx_hash is None:
+        tx_hash = _DUMMY_TX_HASH
+    
+    user = await bootstrap_user_with_balance(
+        session, telegram_id, username, deposit_balance=deposit_balance
+    )
+    transaction = await create_transaction(
+        session=session,
+        user_id=user.id,
+        tx_type=tx_type,
+        amount=amount,
+        currency="USDT",
+        tx_metadata={
+            "tx_hash": tx_hash,
+            "confirmations": 0,
+            "status": "pending"
+        }
+    )
+    
+    return user, transaction
+
+
 async def create_test_transaction(
     session: AsyncSession,
     user_id: UUID,
@@ -75,7 +206,7 @@ async def create_test_transaction(
 ) -> Transaction:
     """Create a test transaction with common defaults."""
     if tx_hash is None:
-        tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+        tx_hash = _DUMMY_TX_HASH
     
     metadata = {
         "tx_hash": tx_hash,
@@ -100,31 +231,22 @@ async def create_multiple_test_users(
     base_telegram_id: int = 10000
 ) -> List[User]:
     """Create multiple test users with wallets."""
-    users = []
-    
-    for i in range(count):
-        user = await create_test_user_with_wallet(
-            session,
-            telegram_id=base_telegram_id + i,
-            username=f"testuser{i}"
-        )
-        users.append(user)
-    
-    return users
+    return await bulk_create_users_with_wallets(
+        session,
+        [(base_telegram_id + i, f"testuser{i}") for i in range(count)]
+    )
 
 
 async def get_wallet_balance(session: AsyncSession, user_id: UUID) -> dict:
     """Get current wallet balance for a user."""
-    from app.repos.wallet_repo import get_wallet_for_user
-    
-    wallet = await get_wallet_for_user(session, user_id)
-    if not wallet:
+    row = (await session.execute(_WALLET_BAL_STMT, {"uid": user_id})).one_or_none()
+    if row is None:
         return {"deposit": Decimal('0'), "bonus": Decimal('0'), "winning": Decimal('0')}
     
     return {
-        "deposit": wallet.deposit_balance,
-        "bonus": wallet.bonus_balance,
-        "winning": wallet.winning_balance
+        "deposit": row.deposit_balance,
+        "bonus": row.bonus_balance,
+        "winning": row.winning_balance
     }
 
 
@@ -145,6 +267,38 @@ async def assert_wallet_balance(
         assert balance["winning"] == expected_winning
 
 
+async def deposit_balance_is(session: AsyncSession, user_id: UUID, expected: Decimal) -> bool:
+    """Check a user's deposit balance with a column SELECT (no identity map)."""
+    row = (await session.execute(_WALLET_BAL_STMT, {"uid": user_id})).one_or_none()
+    return row is not None and row.deposit_balance == expected
+
+
+async def wait_until(
+    predicate: Callable[[], Awaitable[bool]],
+    timeout: float = 2.0,
+    interval: float = 0.02
+) -> None:
+    """
+    Poll an async predicate until it holds, instead of sleeping a fixed time.
+    
+    Args:
+        predicate: Zero-argument coroutine function returning a bool
+        timeout: Seconds to keep polling before failing
+        interval: Seconds to wait between polls
+    
+    Raises:
+        AssertionError: If the predicate does not hold within timeout
+    """
+    async def poll():
+        while not await predicate():
+            await asyncio.sleep(interval)
+    
+    try:
+        await asyncio.wait_for(poll(), timeout)
+    except asyncio.TimeoutError:
+        raise AssertionError(f"Condition not met within {timeout}s") from None
+
+
 async def simulate_concurrent_operations(
     session: AsyncSession,
     operations: List[callable],
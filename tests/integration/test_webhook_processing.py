@@ -10,7 +10,7 @@ from app.repos.user_repo import create_user
 from app.repos.wallet_repo import create_wallet_for_user
 from app.repos.transaction_repo import create_transaction, get_transaction_by_id
 from app.models.enums import UserStatus
-from tests.fixtures.database import assert_wallet_balance
+from tests.fixtures.database import _DUMMY_TX_HASH, assert_wallet_balance
 
 
 @pytest.mark.integration
@@ -28,7 +28,7 @@ async def test_webhook_deposit_confirmation(test_client, async_session):
     wallet = await create_wallet_for_user(async_session, user.id)
     
     # Create pending deposit transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+    tx_hash = _DUMMY_TX_HASH
     transaction = await create_transaction(
         session=async_session,
         user_id=user.id,
@@ -100,7 +100,7 @@ async def test_webhook_insufficient_confirmations(test_client, async_session):
     wallet = await create_wallet_for_user(async_session, user.id)
     
     # Create pending deposit transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+    tx_hash = _DUMMY_TX_HASH
     transaction = await create_transaction(
         session=async_session,
         user_id=user.id,
@@ -158,7 +158,7 @@ async def test_webhook_idempotency(test_client, async_session):
     wallet = await create_wallet_for_user(async_session, user.id)
     
     # Create pending deposit transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+    tx_hash = _DUMMY_TX_HASH
     transaction = await create_transaction(
         session=async_session,
         user_id=user.id,
@@ -229,7 +229,7 @@ async def test_webhook_failed_transaction(test_client, async_session):
     wallet = await create_wallet_for_user(async_session, user.id)
     
     # Create pending deposit transaction
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+    tx_hash = _DUMMY_TX_HASH
     transaction = await create_transaction(
         session=async_session,
         user_id=user.id,
@@ -276,7 +276,7 @@ async def test_webhook_failed_transaction(test_client, async_session):
 @pytest.mark.asyncio
 async def test_webhook_missing_user(test_client, async_session):
     """Test webhook with missing user ID."""
-    tx_hash = f"0x{''.join([f'{i:02x}' for i in range(32)])}"
+    tx_hash = _DUMMY_TX_HASH
     
     # Send webhook without user_id
     webhook_payload = {